@@ -0,0 +1,50 @@
+import re
+
+import requests
+
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# firecrawl-py writes the status into its error messages as "Status code 429" or "Status code: 429".
+_STATUS_IN_MESSAGE = re.compile(r"Status code:? (\d{3})\b")
+
+
+def _own_status_code(error: BaseException):
+    """HTTP status carried by this exception itself, ignoring its chain."""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if isinstance(status, int):
+        return status
+    code = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def _exception_chain(error: BaseException):
+    """Yield the exception and everything it was raised from or while handling."""
+    # firecrawl-py re-raises its errors as ValueError(str(e)), which drops .response but
+    # keeps the original exception as __context__.
+    seen = set()
+    current = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        yield current
+        current = current.__cause__ or current.__context__
+
+
+def error_status_code(error: BaseException):
+    """Best-effort HTTP status code of a requests, firecrawl-py or google-api-core exception."""
+    for current in _exception_chain(error):
+        status = _own_status_code(current)
+        if status is not None:
+            return status
+    
+    match = _STATUS_IN_MESSAGE.search(str(error))
+    return int(match.group(1)) if match else None
+
+
+def is_lost_response(error: BaseException) -> bool:
+    """Whether a request failed without any response, so the server may or may not have acted on it."""
+    return any(
+        isinstance(current, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+        for current in _exception_chain(error)
+    )
@@ -1,8 +1,24 @@
 import asyncio
+import collections
+import functools
+import hashlib
+import json
+import os
+import random
+import string
+import threading
+import time
+import uuid
+import requests
 import streamlit as st
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
+import google.ai.generativelanguage as glm
 import google.generativeai as genai
 from firecrawl import FirecrawlApp
+from api_errors import RETRYABLE_STATUS_CODES, error_status_code, is_lost_response
+from reports import ReportCache, estimate_tokens, pack_to_budget, report_score
+from requests.adapters import HTTPAdapter
 
 
 st.set_page_config(
@@ -12,6 +28,23 @@ st.set_page_config(
 )
 
 
+# The stronger model writes the reports; bounded subtasks (source summaries, judge) use the cheap tier.
+SYNTHESIS_MODEL_NAME = "gemini-1.5-flash"
+SUMMARY_MODEL_NAME = "gemini-1.5-flash-8b"
+REPORT_GENERATION_CONFIG = genai.GenerationConfig(max_output_tokens=4096, temperature=0.4, top_p=0.9, candidate_count=1)
+SUMMARY_GENERATION_CONFIG = genai.GenerationConfig(max_output_tokens=256, temperature=0.4, top_p=0.9, candidate_count=1)
+JUDGE_GENERATION_CONFIG = genai.GenerationConfig(max_output_tokens=2, temperature=0, candidate_count=1)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "5"))
+SOURCES_TOKEN_BUDGET = 6000
+REPORT_PROMPT_TOKEN_BUDGET = 12000
+# Initial reports scoring above this (words + 100 per section heading) skip enhancement.
+ENHANCEMENT_SKIP_SCORE = 3000
+# Crawl parameters for every research run; the initial report's cache key is built from them too.
+RESEARCH_PARAMS = {"max_depth": 3, "time_limit": 180, "max_urls": 10}
+# Source fields the report stages read, with the character limit kept for each.
+SOURCE_FIELD_LIMITS = {"url": None, "summary": 2000, "markdown": 4000}
+
+
 if "gemini_api_key" not in st.session_state:
     st.session_state.gemini_api_key = ""
 if "firecrawl_api_key" not in st.session_state:
@@ -38,8 +71,167 @@ with st.sidebar:
         st.session_state.firecrawl_api_key = firecrawl_api_key
 
 
-if st.session_state.gemini_api_key:
-    genai.configure(api_key=st.session_state.gemini_api_key)
+@st.cache_resource(show_spinner=False)
+def load_gemini_model(api_key: str, model_name: str):
+    """Build a Gemini model bound to its own sync client for this API key, once per key and model name."""
+    model = genai.GenerativeModel(model_name)
+    # Without this the model falls back to the process-wide key from genai.configure,
+    # which another session entering a different key would silently replace.
+    model._client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+    return model
+
+
+@st.cache_resource(show_spinner=False)
+def get_executor() -> ThreadPoolExecutor:
+    """Process-wide worker pool for blocking SDK calls, so they never run on the event loop."""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="sdk-worker")
+
+
+@st.cache_resource(show_spinner=False)
+def get_http_session() -> requests.Session:
+    """Shared keep-alive session so Firecrawl calls reuse pooled TCP/TLS connections."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class PooledFirecrawlApp(FirecrawlApp):
+    """FirecrawlApp that sends its HTTP traffic through a shared requests.Session."""
+
+    def __init__(self, api_key: str, session: requests.Session):
+        super().__init__(api_key=api_key)
+        self._session = session
+        self._local = threading.local()
+
+    def async_deep_research(self, query, params=None, idempotency_key: str = None):
+        # Thread-local because the cached client is shared by every session.
+        self._local.idempotency_key = idempotency_key
+        try:
+            return super().async_deep_research(query, params)
+        finally:
+            self._local.idempotency_key = None
+
+    def _post_request(self, url, data, headers, retries=3, backoff_factor=0.5):
+        idempotency_key = getattr(self._local, "idempotency_key", None)
+        if idempotency_key:
+            headers = {**headers, "x-idempotency-key": idempotency_key}
+        for attempt in range(retries):
+            response = self._session.post(url, headers=headers, json=data, timeout=30)
+            if response.status_code != 502:
+                return response
+            time.sleep(backoff_factor * (2 ** attempt))
+        return response
+
+    def _get_request(self, url, headers, retries=3, backoff_factor=0.5):
+        for attempt in range(retries):
+            response = self._session.get(url, headers=headers, timeout=30)
+            if response.status_code != 502:
+                return response
+            time.sleep(backoff_factor * (2 ** attempt))
+        return response
+
+    def _get_json(self, endpoint: str, action: str) -> Dict[str, Any]:
+        response = self._get_request(f"{self.api_url}{endpoint}", self._prepare_headers())
+        if response.status_code != 200:
+            self._handle_error(response, action)
+        return response.json()
+
+    # firecrawl-py 1.15.0 has no wrappers for the team quota endpoints, so call them directly.
+    def get_credit_usage(self) -> Dict[str, Any]:
+        return self._get_json("/v1/team/credit-usage", "get credit usage")
+
+    def get_concurrency(self) -> Dict[str, Any]:
+        return self._get_json("/v1/concurrency-check", "check concurrency")
+
+
+@st.cache_resource(show_spinner=False)
+def get_firecrawl(api_key: str) -> PooledFirecrawlApp:
+    """Build a Firecrawl client once per API key and reuse it across reruns."""
+    return PooledFirecrawlApp(api_key=api_key, session=get_http_session())
+
+
+def quota_field(response, *names):
+    """Read the first present field from a firecrawl-py response, looking inside `data` too."""
+    data = response.get("data") if isinstance(response, dict) else getattr(response, "data", None)
+    for source in (response, data):
+        for name in names:
+            value = source.get(name) if isinstance(source, dict) else getattr(source, name, None)
+            if value is not None:
+                return value
+    return None
+
+
+def remaining_credits(firecrawl_app: PooledFirecrawlApp):
+    """Remaining Firecrawl credits, or None if the API cannot report them."""
+    try:
+        return quota_field(firecrawl_app.get_credit_usage(), "remaining_credits", "remainingCredits")
+    except Exception:
+        return None
+
+
+def check_firecrawl_quota(firecrawl_app: PooledFirecrawlApp, estimated_credits: int):
+    """Return why a deep research run cannot start, or None if quota is sufficient or unknown."""
+    credits = remaining_credits(firecrawl_app)
+    if credits is not None and credits < estimated_credits:
+        return f"Only {credits} Firecrawl credits remain but a run needs about {estimated_credits}."
+    
+    try:
+        concurrency = firecrawl_app.get_concurrency()
+        active = quota_field(concurrency, "concurrency", "active_crawls")
+        limit = quota_field(concurrency, "max_concurrency", "maxConcurrency", "max_crawls")
+    except Exception:
+        active = limit = None
+    if active is not None and limit is not None and active >= limit:
+        return f"All {limit} Firecrawl concurrent crawl slots are in use."
+    return None
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_remaining_credits(api_key: str):
+    """Remaining credits for the sidebar, refreshed at most once a minute."""
+    return remaining_credits(get_firecrawl(api_key))
+
+
+def research_idempotency_key(task_id: str, query: str, params: Dict[str, Any]) -> str:
+    """Deterministic idempotency key for one deep research task."""
+    payload = {"op": "deep_research", "task": task_id, "q": query, "p": params}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def api_semaphore() -> asyncio.Semaphore:
+    """This session's cap on concurrent API calls, created lazily from inside the running loop."""
+    # Python 3.9 binds a Semaphore to get_event_loop() at construction, which fails on the
+    # loop-less ScriptRunner thread, so it must not be built at module scope.
+    if "api_semaphore" not in st.session_state:
+        st.session_state.api_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+    return st.session_state.api_semaphore
+
+
+async def with_backoff(coro_fn, max_retries: int = 5, base: float = 1.0, cap: float = 32.0, retry_lost_responses: bool = False):
+    """Await coro_fn() under api_semaphore(), retrying 429/5xx errors with jittered exponential backoff.
+    
+    With retry_lost_responses, timeouts and dropped connections are retried too; only pass it
+    for calls that are safe to repeat, such as reads or requests carrying an idempotency key.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            async with api_semaphore():
+                return await coro_fn()
+        except Exception as e:
+            retryable = error_status_code(e) in RETRYABLE_STATUS_CODES or (retry_lost_responses and is_lost_response(e))
+            if attempt == max_retries or not retryable:
+                raise
+        await asyncio.sleep(min(cap, base * 2 ** attempt) + random.random() * 0.5)
+
+
+# The sidebar credit lookup is a real GET over the shared HTTP session, so the first one per key
+# also opens the pooled Firecrawl connection before Start Research is clicked.
+if st.session_state.firecrawl_api_key:
+    credits_left = cached_remaining_credits(st.session_state.firecrawl_api_key)
+    if credits_left is not None:
+        st.sidebar.caption(f"Firecrawl credits remaining: {credits_left}")
 
 
 st.title("📘 Gemini Deep Research Agent")
@@ -49,14 +241,24 @@ st.markdown("This Gemini Agent performs deep research on any topic using Firecra
 research_topic = st.text_input("Enter your research topic:", placeholder="e.g., Latest developments in AI")
 
 
-async def deep_research(query: str, max_depth: int, time_limit: int, max_urls: int) -> Dict[str, Any]:
-    """Perform comprehensive web research using Firecrawl's deep research endpoint."""
+def compact_source(source: Dict[str, Any]) -> Dict[str, Any]:
+    """Project a Firecrawl source onto the fields the report stages read."""
+    return {
+        field: source[field][:limit] if limit and isinstance(source[field], str) else source[field]
+        for field, limit in SOURCE_FIELD_LIMITS.items()
+        if field in source
+    }
+
+
+async def deep_research(query: str, max_depth: int, time_limit: int, max_urls: int, on_activity=None) -> Dict[str, Any]:
+    """Perform comprehensive web research using Firecrawl's deep research endpoint, reporting progress to on_activity."""
     if not st.session_state.firecrawl_api_key:
         st.error("Firecrawl API key is missing.")
         return {"error": "Firecrawl API key is missing", "success": False}
     
     try:
-        firecrawl_app = FirecrawlApp(api_key=st.session_state.firecrawl_api_key)
+        firecrawl_app = get_firecrawl(st.session_state.firecrawl_api_key)
+        loop = asyncio.get_running_loop()
         
         params = {
             "maxDepth": max_depth,
@@ -64,15 +266,56 @@ async def deep_research(query: str, max_depth: int, time_limit: int, max_urls: i
             "maxUrls": max_urls
         }
         
-        def on_activity(activity):
-            st.write(f"[{activity['type']}] {activity['message']}")
+        # Deep research spends roughly one credit per URL it visits.
+        quota_error = await loop.run_in_executor(
+            get_executor(),
+            functools.partial(check_firecrawl_quota, firecrawl_app, estimated_credits=max_urls)
+        )
+        if quota_error:
+            st.error(f"{quota_error} Retry once credits or a crawl slot free up.")
+            return {"error": quota_error, "success": False}
+        
+        st.session_state.research_task_id = uuid.uuid4().hex
+        recent_activity = collections.deque(maxlen=20)
+        seen_activities = 0
         
-        with st.spinner("Performing deep research..."):
-            results = firecrawl_app.deep_research(
-                query=query,
-                params=params,
-                on_activity=on_activity
-            )
+        try:
+            idempotency_key = research_idempotency_key(st.session_state.research_task_id, query, params)
+            # The job is started exactly once: every retry resends the same key, so a retry after
+            # a lost response is deduplicated by Firecrawl instead of launching a second paid run.
+            job = await with_backoff(lambda: loop.run_in_executor(
+                get_executor(),
+                functools.partial(firecrawl_app.async_deep_research, query, params, idempotency_key=idempotency_key)
+            ), retry_lost_responses=True)
+            if not job.get('success') or 'id' not in job:
+                st.error("Firecrawl did not start the deep research job.")
+                return {"error": job.get('error', 'Deep research job did not start'), "success": False}
+            
+            # Polls only read the accepted job, so a transient poll failure never re-POSTs.
+            while True:
+                results = await with_backoff(lambda: loop.run_in_executor(
+                    get_executor(),
+                    firecrawl_app.check_deep_research_status,
+                    job['id']
+                ), retry_lost_responses=True)
+                
+                activities = results.get('activities', [])
+                for activity in activities[seen_activities:]:
+                    message = f"[{activity['type']}] {activity['message']}"
+                    recent_activity.append(message)
+                    if on_activity:
+                        on_activity(message)
+                seen_activities = len(activities)
+                
+                if results.get('status') == 'completed':
+                    break
+                if results.get('status') == 'failed':
+                    raise Exception(f"Deep research failed. Error: {results.get('error')}")
+                if results.get('status') != 'processing':
+                    raise Exception("Deep research job terminated unexpectedly")
+                await asyncio.sleep(2)
+        finally:
+            st.session_state.pop("research_task_id", None)
         
         if 'data' not in results or 'finalAnalysis' not in results['data']:
             st.error("Invalid response from Firecrawl API.")
@@ -82,56 +325,65 @@ async def deep_research(query: str, max_depth: int, time_limit: int, max_urls: i
             "success": True,
             "final_analysis": results['data']['finalAnalysis'],
             "sources_count": len(results['data']['sources']),
-            "sources": results['data']['sources']
+            "sources": [compact_source(source) for source in results['data']['sources']],
+            "activity": list(recent_activity)
         }
     except Exception as e:
         st.error(f"Deep research error: {str(e)}. Check API key or network.")
         return {"error": str(e), "success": False}
 
 
-def get_gemini_model(model_name="gemini-1.5-flash"):
-    """Initialize and return a Gemini model instance."""
+def get_gemini_model(model_name=SYNTHESIS_MODEL_NAME):
+    """Return this session's Gemini model; call it from a coroutine on the session loop."""
     if not st.session_state.gemini_api_key:
         st.error("Gemini API key is missing.")
         return None
     try:
-        return genai.GenerativeModel(model_name)
+        api_key = st.session_state.gemini_api_key
+        models = st.session_state.setdefault("gemini_models", {})
+        if (api_key, model_name) not in models:
+            # A grpc.aio channel belongs to the loop it was created on and every session has
+            # its own loop, so the async client is built here rather than in the shared cache.
+            # All models share it, so one warm-up readies the channel for every stage.
+            async_clients = st.session_state.setdefault("gemini_async_clients", {})
+            if api_key not in async_clients:
+                async_clients[api_key] = glm.GenerativeServiceAsyncClient(client_options={"api_key": api_key})
+            model = genai.GenerativeModel(model_name)
+            model._client = load_gemini_model(api_key, model_name)._client
+            model._async_client = async_clients[api_key]
+            models[(api_key, model_name)] = model
+        return models[(api_key, model_name)]
     except Exception as e:
         st.error(f"Error initializing Gemini model: {str(e)}")
         return None
 
 
-async def run_research_with_gemini(query: str, research_function):
-    """Run research using Gemini model."""
-    model = get_gemini_model()
-    if not model:
-        return "Failed to initialize Gemini model. Please check your API key."
-    
-    research_results = await research_function(
-        query=query,
-        max_depth=3,
-        time_limit=180,
-        max_urls=10
-    )
-    
-    if not research_results.get("success", False):
-        return f"Research failed: {research_results.get('error', 'Unknown error')}"
-    
-   
-    sources_text = "\n\n".join([
-        f"Source {i+1}: {source['url']}\nSummary: {source.get('summary', 'No summary available')}"
-        for i, source in enumerate(research_results['sources'][:5])
-        if 'url' in source 
-    ])
-    
-    research_prompt = f"""
-    You are a research assistant analyzing the following research results on: "{query}"
+async def stream_report(model, prompt: str) -> str:
+    """Stream a Gemini generation into the page as it arrives and return the full text."""
+    placeholder = st.empty()
+    chunks = []
+    try:
+        response = await model.generate_content_async(
+            prompt,
+            generation_config=REPORT_GENERATION_CONFIG,
+            stream=True
+        )
+        async for chunk in response:
+            chunks.append(chunk.text)
+            placeholder.markdown("".join(chunks))
+    finally:
+        placeholder.empty()
+    return "".join(chunks)
+
+
+RESEARCH_PROMPT_TMPL = string.Template("""
+    You are a research assistant analyzing the following research results on: "$query"
     
     Final Analysis from research tool:
-    {research_results['final_analysis']}
+    $final_analysis
     
-    Sources ({research_results['sources_count']} total):
-    {sources_text}
+    Sources ($sources_count total):
+    $sources_text
     
     Please organize these research findings into a well-structured academic report with:
     1. Executive Summary
@@ -142,27 +394,13 @@ async def run_research_with_gemini(query: str, research_function):
     6. References (properly cite all sources)
     
     Format the report in Markdown.
-    """
-    
-    try:
-        response = model.generate_content(research_prompt)
-        return response.text
-    except Exception as e:
-        st.error(f"Gemini generation error: {str(e)}")
-        return f"Failed to generate report: {str(e)}"
+    """)
 
-
-async def enhance_report_with_gemini(topic: str, initial_report: str):
-    """Enhance the report using Gemini model."""
-    model = get_gemini_model()
-    if not model:
-        return "Failed to initialize Gemini model. Please check your API key."
-    
-    enhancement_prompt = f"""
-    RESEARCH TOPIC: {topic}
+ENHANCEMENT_PROMPT_TMPL = string.Template("""
+    RESEARCH TOPIC: $topic
     
     INITIAL RESEARCH REPORT:
-    {initial_report}
+    $initial_report
     
     As an expert content enhancer specializing in research elaboration, please enhance this research report by:
     1. Adding more detailed explanations of complex concepts
@@ -174,60 +412,232 @@ async def enhance_report_with_gemini(topic: str, initial_report: str):
     
     Maintain academic rigor and factual accuracy while making the report more comprehensive.
     Format the enhanced report in Markdown.
-    """
+    """)
+
+
+async def static_prompt_tokens(model, template: string.Template) -> int:
+    """Tokens in a prompt template with every placeholder left empty, counted once per session and model."""
+    static_text = template.safe_substitute(collections.defaultdict(str))
+    counts = st.session_state.setdefault("static_prompt_tokens", {})
+    key = (model.model_name, static_text)
+    if key not in counts:
+        try:
+            counts[key] = (await model.count_tokens_async(static_text)).total_tokens
+        except Exception:
+            return estimate_tokens(static_text)
+    return counts[key]
+
+
+async def summarize_source(model, source: Dict[str, Any]) -> str:
+    """Distill a single source into a short summary for the report prompt."""
+    text = source.get('markdown') or source.get('summary')
+    if not text:
+        return 'No summary available'
     
+    prompt = f"Summarize the key facts from this source in a few sentences:\n\n{text[:4000]}"
     try:
-        response = model.generate_content(enhancement_prompt)
+        response = await with_backoff(lambda: model.generate_content_async(
+            prompt,
+            generation_config=SUMMARY_GENERATION_CONFIG
+        ))
         return response.text
+    except Exception:
+        return source.get('summary', 'No summary available')
+
+
+async def run_research_with_gemini(query: str, research_function, max_depth: int = 3, time_limit: int = 180, max_urls: int = 10):
+    """Run research using Gemini model."""
+    model = get_gemini_model()
+    summary_model = get_gemini_model(SUMMARY_MODEL_NAME)
+    if not model or not summary_model:
+        return "Failed to initialize Gemini model. Please check your API key."
+    
+    with st.status("Performing deep research...", expanded=False) as status:
+        research_results = await research_function(
+            query=query,
+            max_depth=max_depth,
+            time_limit=time_limit,
+            max_urls=max_urls,
+            on_activity=lambda message: status.update(label=message)
+        )
+        if research_results.get("success", False):
+            st.text("\n".join(research_results["activity"]))
+            status.update(label="Deep research complete", state="complete")
+        else:
+            status.update(label="Deep research failed", state="error")
+    
+    if not research_results.get("success", False):
+        return f"Research failed: {research_results.get('error', 'Unknown error')}"
+    
+   
+    # Filter before numbering so "Source N" matches what the prompt actually lists.
+    sources = [source for source in research_results['sources'] if 'url' in source]
+    with st.spinner(f"Summarizing {min(len(sources), 10)} sources..."):
+        summaries = await asyncio.gather(*(summarize_source(summary_model, source) for source in sources[:10]))
+    # Sources past the summarized ones fall back to Firecrawl's own summary.
+    summaries += [source.get('summary', 'No summary available') for source in sources[10:]]
+    
+    # Whatever the fixed instructions and the analysis leave of the prompt budget goes to sources.
+    sources_budget = min(
+        SOURCES_TOKEN_BUDGET,
+        REPORT_PROMPT_TOKEN_BUDGET
+        - await static_prompt_tokens(model, RESEARCH_PROMPT_TMPL)
+        - estimate_tokens(research_results['final_analysis'])
+    )
+    sources_text = "\n\n".join(pack_to_budget((
+        f"Source {i+1}: {source['url']}\nSummary: {summary}"
+        for i, (source, summary) in enumerate(zip(sources, summaries))
+    ), sources_budget))
+    
+    research_prompt = RESEARCH_PROMPT_TMPL.substitute(
+        query=query,
+        final_analysis=research_results['final_analysis'],
+        sources_count=research_results['sources_count'],
+        sources_text=sources_text
+    )
+    
+    try:
+        return await with_backoff(lambda: stream_report(model, research_prompt))
     except Exception as e:
-        st.error(f"Gemini enhancement error: {str(e)}")
-        return f"Failed to enhance report: {str(e)}"
+        st.error(f"Gemini generation error: {str(e)}")
+        return f"Failed to generate report: {str(e)}"
+
 
-async def run_research_process(topic: str):
-    """Run the complete research process."""
-    with st.spinner("Conducting initial research..."):
-        initial_report = await run_research_with_gemini(topic, deep_research)
+async def needs_enhancement(model, topic: str, report: str) -> bool:
+    """Decide whether the enhancement pass is worth running for this report."""
+    if report_score(report) > ENHANCEMENT_SKIP_SCORE:
+        return False
     
-    if isinstance(initial_report, str) and "Failed" in initial_report:
-        return initial_report
+    judge_prompt = (
+        f"Respond only YES or NO: does this research report on \"{topic}\" need enhancement "
+        f"with more detail, examples or context?\n\n{report}"
+    )
+    try:
+        response = await with_backoff(lambda: model.generate_content_async(
+            judge_prompt,
+            generation_config=JUDGE_GENERATION_CONFIG
+        ))
+        return not response.text.strip().upper().startswith("NO")
+    except Exception:
+        return True
+
+
+async def enhance_report_with_gemini(topic: str, initial_report: str):
+    """Enhance the report using Gemini model; also returns whether the enhancement pass ran."""
+    model = get_gemini_model()
+    judge_model = get_gemini_model(SUMMARY_MODEL_NAME)
+    if not model or not judge_model:
+        return "Failed to initialize Gemini model. Please check your API key.", False
+    
+    if not await needs_enhancement(judge_model, topic, initial_report):
+        return initial_report, False
+    
+    enhancement_prompt = ENHANCEMENT_PROMPT_TMPL.substitute(topic=topic, initial_report=initial_report)
+    
+    try:
+        return await with_backoff(lambda: stream_report(model, enhancement_prompt)), True
+    except Exception as e:
+        st.error(f"Gemini enhancement error: {str(e)}")
+        return f"Failed to enhance report: {str(e)}", False
+
+def run_async(coro):
+    """Run a coroutine on this session's persistent event loop."""
+    if "event_loop" not in st.session_state:
+        st.session_state.event_loop = asyncio.new_event_loop()
+    loop = st.session_state.event_loop
+    asyncio.set_event_loop(loop)
+    return loop.run_until_complete(coro)
+
+
+def is_failed_report(report: str) -> bool:
+    """Check whether a stage returned one of its failure messages instead of a report."""
+    return report.startswith(("Failed", "Research failed"))
+
+
+@st.cache_resource(show_spinner=False)
+def get_report_cache() -> ReportCache:
+    """Process-wide report cache: one hour per entry, at most 32 entries."""
+    return ReportCache(ttl=3600, max_entries=32)
+
+
+def run_research_process(topic: str):
+    """Run the complete research process and keep the reports in session state."""
+    cache = get_report_cache()
     
-    with st.expander("View Initial Research Report"):
-        st.markdown(initial_report)
+    initial_key = ("initial", topic, *sorted(RESEARCH_PARAMS.items()))
+    initial_report = cache.get(initial_key)
+    if initial_report is None:
+        with st.spinner("Conducting initial research..."):
+            initial_report = run_async(run_research_with_gemini(topic, deep_research, **RESEARCH_PARAMS))
+        if is_failed_report(initial_report):
+            return initial_report
+        cache.put(initial_key, initial_report)
     
-    with st.spinner("Enhancing the report with additional information..."):
-        enhanced_report = await enhance_report_with_gemini(topic, initial_report)
+    enhanced_key = ("enhanced", topic, hashlib.sha256(initial_report.encode()).hexdigest())
+    cached_enhancement = cache.get(enhanced_key)
+    if cached_enhancement is None:
+        with st.spinner("Enhancing the report with additional information..."):
+            enhanced_report, enhanced = run_async(enhance_report_with_gemini(topic, initial_report))
+        if is_failed_report(enhanced_report):
+            return enhanced_report
+        cache.put(enhanced_key, (enhanced_report, enhanced))
+    else:
+        enhanced_report, enhanced = cached_enhancement
     
+    st.session_state.last_topic = topic
+    st.session_state.last_initial_report = initial_report
+    st.session_state.last_report = enhanced_report
+    st.session_state.last_report_enhanced = enhanced
     return enhanced_report
 
 
+async def warm_up_gemini():
+    """Open this session's shared async Gemini channel with a throwaway call, off the research hot path."""
+    model = get_gemini_model()
+    if model:
+        await asyncio.wait_for(model.count_tokens_async("warmup"), timeout=3)
+
+
+# Runs once per entered key, so DNS, TLS and the grpc.aio channel the stages use are ready
+# before Start Research is clicked.
+if st.session_state.gemini_api_key and st.session_state.get("gemini_warm") != st.session_state.gemini_api_key:
+    st.session_state.gemini_warm = st.session_state.gemini_api_key
+    try:
+        run_async(warm_up_gemini())
+    except Exception:
+        pass
+
+
 if st.button("Start Research", disabled=not (st.session_state.gemini_api_key and st.session_state.firecrawl_api_key and research_topic)):
     if not st.session_state.gemini_api_key or not st.session_state.firecrawl_api_key:
         st.warning("Please enter both API keys in the sidebar.")
     elif not research_topic:
         st.warning("Please enter a research topic.")
     else:
-        async def run():
-            try:
-                report_placeholder = st.empty()
-                enhanced_report = await run_research_process(research_topic)
-                if "Failed" not in enhanced_report:
-                    report_placeholder.markdown("## Enhanced Research Report")
-                    report_placeholder.markdown(enhanced_report)
-                    st.download_button(
-                        "Download Report",
-                        enhanced_report,
-                        file_name=f"{research_topic.replace(' ', '_')}_report.md",
-                        mime="text/markdown"
-                    )
-                else:
-                    st.error(enhanced_report)
-            except Exception as e:
-                st.error(f"An error occurred: {str(e)}")
-        
-        
-        import nest_asyncio
-        nest_asyncio.apply()
-        asyncio.run(run())
+        try:
+            enhanced_report = run_research_process(research_topic)
+            if is_failed_report(enhanced_report):
+                st.error(enhanced_report)
+        except Exception as e:
+            st.error(f"An error occurred: {str(e)}")
+
+
+# Rendered from session state so reruns (e.g. the download click) keep the report on screen.
+if st.session_state.get("last_report"):
+    if st.session_state.last_report_enhanced:
+        with st.expander("View Initial Research Report"):
+            st.markdown(st.session_state.last_initial_report)
+        st.markdown("## Enhanced Research Report")
+    else:
+        st.markdown("## Research Report")
+        st.caption("The initial report was already thorough, so the enhancement pass was skipped.")
+    st.markdown(st.session_state.last_report)
+    st.download_button(
+        "Download Report",
+        st.session_state.last_report,
+        file_name=f"{st.session_state.last_topic.replace(' ', '_')}_report.md",
+        mime="text/markdown"
+    )
 
 
 st.markdown("---")
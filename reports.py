@@ -0,0 +1,56 @@
+import collections
+import re
+import threading
+import time
+from typing import Iterable, List
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token) for prompt budgeting."""
+    return len(text) // 4
+
+
+def pack_to_budget(entries: Iterable[str], budget: int) -> List[str]:
+    """Keep entries in order until the next one would push the total past the token budget."""
+    packed = []
+    used = 0
+    for entry in entries:
+        used += estimate_tokens(entry)
+        if used > budget:
+            break
+        packed.append(entry)
+    return packed
+
+
+def report_score(report: str) -> int:
+    """Cheap length and coverage score for a Markdown report."""
+    return len(report.split()) + 100 * len(re.findall(r"^## ", report, re.MULTILINE))
+
+
+class ReportCache:
+    """Thread-safe TTL/LRU store for finished reports that, unlike st.cache_data, records no page elements."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self._ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+import requests
+
+from api_errors import RETRYABLE_STATUS_CODES, error_status_code, is_lost_response
+
+
+def make_response(status_code, body=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body or {"error": "boom"}).encode()
+    return response
+
+
+def test_http_error_with_response():
+    error = requests.exceptions.HTTPError("fail", response=make_response(503))
+    assert error_status_code(error) == 503
+
+
+def test_unrelated_error_has_no_status():
+    assert error_status_code(ValueError("bad input")) is None
+
+
+def test_status_parsed_from_message_when_chain_is_lost():
+    error = ValueError("Unexpected error during start deep research: Status code 502. boom")
+    assert error_status_code(error) == 502
+
+
+@pytest.mark.parametrize("status_code", sorted(RETRYABLE_STATUS_CODES))
+def test_firecrawl_start_error_is_retryable(monkeypatch, status_code):
+    firecrawl = pytest.importorskip("firecrawl")
+    app = firecrawl.FirecrawlApp(api_key="fc-test")
+    monkeypatch.setattr(app, "_post_request", lambda *args, **kwargs: make_response(status_code))
+    
+    with pytest.raises(ValueError) as excinfo:
+        app.async_deep_research("topic", {"maxDepth": 1})
+    
+    assert error_status_code(excinfo.value) == status_code
+
+
+def test_firecrawl_status_poll_error_is_retryable(monkeypatch):
+    firecrawl = pytest.importorskip("firecrawl")
+    app = firecrawl.FirecrawlApp(api_key="fc-test")
+    monkeypatch.setattr(app, "_get_request", lambda *args, **kwargs: make_response(429))
+    
+    with pytest.raises(ValueError) as excinfo:
+        app.check_deep_research_status("job-id")
+    
+    assert error_status_code(excinfo.value) == 429
+
+
+def test_google_api_error_code():
+    exceptions = pytest.importorskip("google.api_core.exceptions")
+    assert error_status_code(exceptions.ResourceExhausted("quota")) == 429
+    assert error_status_code(exceptions.ServiceUnavailable("down")) == 503
+
+
+def test_timeout_is_lost_response():
+    assert is_lost_response(requests.exceptions.ReadTimeout("read timed out"))
+    assert is_lost_response(requests.exceptions.ConnectionError("reset"))
+
+
+def test_http_error_is_not_lost_response():
+    error = requests.exceptions.HTTPError("fail", response=make_response(503))
+    assert not is_lost_response(error)
+
+
+def test_firecrawl_lost_start_response_is_detected(monkeypatch):
+    firecrawl = pytest.importorskip("firecrawl")
+    app = firecrawl.FirecrawlApp(api_key="fc-test")
+    
+    def lost_post(*args, **kwargs):
+        raise requests.exceptions.ReadTimeout("read timed out")
+    
+    monkeypatch.setattr(app, "_post_request", lost_post)
+    
+    with pytest.raises(ValueError) as excinfo:
+        app.async_deep_research("topic", {"maxDepth": 1})
+    
+    assert is_lost_response(excinfo.value)
+    assert error_status_code(excinfo.value) is None
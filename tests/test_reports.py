@@ -0,0 +1,76 @@
+import pytest
+
+import reports
+from reports import ReportCache, pack_to_budget, report_score
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(reports.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_cache_returns_stored_value():
+    cache = ReportCache(ttl=60, max_entries=2)
+    cache.put("key", "report")
+    assert cache.get("key") == "report"
+    assert cache.get("missing") is None
+
+
+def test_cache_entry_expires_after_ttl(clock):
+    cache = ReportCache(ttl=60, max_entries=2)
+    cache.put("key", "report")
+
+    clock[0] += 60
+    assert cache.get("key") == "report"
+
+    clock[0] += 1
+    assert cache.get("key") is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ReportCache(ttl=60, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("c", 3)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.get("c") == 3
+
+
+def test_cache_hit_moves_entry_to_end():
+    cache = ReportCache(ttl=60, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+
+def test_cache_put_refreshes_existing_key(clock):
+    cache = ReportCache(ttl=60, max_entries=2)
+    cache.put("a", 1)
+    clock[0] += 50
+    cache.put("a", 2)
+
+    clock[0] += 50
+    assert cache.get("a") == 2
+
+
+def test_pack_to_budget_stops_at_first_entry_over_budget():
+    entries = ["a" * 40, "b" * 40, "c" * 4, "d" * 4]
+    assert pack_to_budget(entries, budget=20) == entries[:2]
+
+
+def test_pack_to_budget_accepts_generators():
+    assert pack_to_budget((text for text in ["x" * 8] * 3), budget=4) == ["x" * 8] * 2
+
+
+def test_report_score_counts_only_level_two_headings():
+    report = "## Summary\n### Detail\n#### Note\ntext with ## inline\n## Findings"
+    assert report_score(report) == len(report.split()) + 200